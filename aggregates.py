@@ -0,0 +1,397 @@
+import datetime
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from typing import Iterable, Optional
+from utils import convert_date
+
+# Questions about the flights as a whole that can be answered from the aggregates
+AGGREGATE_INTENTS = ("count", "busiest_day", "busiest_hour", "earliest", "latest")
+
+# The aggregates are only kept per route and date, so any other parameter needs a full search
+UNSUPPORTED_KEYS = ("flight_number", "time", "before_time", "after_time")
+
+# Dates are stored in the Fenwick trees by their ordinal, so every possible date has an index
+MAX_DATE_INDEX = datetime.date.max.toordinal()
+
+def route_keys(flight: dict[str, Optional[str]]) -> list[tuple[Optional[str], Optional[str]]]:
+    """
+    Gives every (origin, destination) key a flight is counted under, where None means any city.
+    Cities are lower case so lookups are case insensitive like search_flights
+
+    Args:
+        flight (dict[str, Optional[str]]): a flight from the database
+
+    Returns:
+        list[tuple[Optional[str], Optional[str]]]: the keys for the route, the origin, the destination and all flights
+    """
+
+    origin = flight["origin"].lower()
+    destination = flight["destination"].lower()
+    return [(origin, destination), (origin, None), (None, destination), (None, None)]
+
+class FenwickTree:
+    """
+    Counts indexed by date, where updating a date and summing a range of dates
+    both take O(log n) steps. Only the nodes that were updated are stored
+    """
+
+    def __init__(self):
+        self._tree: dict[int, int] = {}
+
+    def add(self, flight_date: datetime.date, amount: int) -> None:
+        """
+        Adds an amount to the count for a date
+
+        Args:
+            flight_date (datetime.date): the date to update
+            amount (int): the amount to add, negative to remove
+        """
+
+        index = flight_date.toordinal()
+        while index <= MAX_DATE_INDEX:
+            self._tree[index] = self._tree.get(index, 0) + amount
+            index += index & -index
+
+    def _prefix_sum(self, index: int) -> int:
+        """
+        Sums the counts for every date up to and including an index
+        """
+
+        total = 0
+        while index > 0:
+            total += self._tree.get(index, 0)
+            index -= index & -index
+        return total
+
+    def range_sum(self, after_date: Optional[datetime.date], before_date: Optional[datetime.date]) -> int:
+        """
+        Sums the counts between two dates, both inclusive
+
+        Args:
+            after_date (Optional[datetime.date]): the first date to sum or None for no limit
+            before_date (Optional[datetime.date]): the last date to sum or None for no limit
+
+        Returns:
+            int: the total count between the dates
+        """
+
+        first = 1 if after_date is None else after_date.toordinal()
+        last = MAX_DATE_INDEX if before_date is None else before_date.toordinal()
+        if first > last:
+            return 0
+        return self._prefix_sum(last) - self._prefix_sum(first - 1)
+
+class FlightAggregates:
+    """
+    Materialized counts and departures over the flight database, kept up to date
+    as flights are added and removed, so counting and summary questions don't
+    have to scan every flight
+    """
+
+    def __init__(self, flights: Iterable[dict[str, Optional[str]]] = ()):
+        """
+        Args:
+            flights (Iterable[dict[str, Optional[str]]]): the flights to build the aggregates from
+        """
+
+        self._totals: dict[tuple, int] = defaultdict(int)
+        self._daily_counts: dict[tuple, dict[datetime.date, int]] = defaultdict(dict)
+        # Cumulative counts by date, overall and for each hour of the day, so date ranges are two lookups
+        self._date_counts: dict[tuple, FenwickTree] = defaultdict(FenwickTree)
+        self._hourly_counts: dict[tuple, list[FenwickTree]] = defaultdict(
+            lambda: [FenwickTree() for _ in range(24)]
+        )
+        # Sorted dates that have at least one flight, so date ranges can be found with bisect
+        self._dates: dict[tuple, list[datetime.date]] = defaultdict(list)
+        # Sorted (time, flight_number, origin, destination) tuples for each date, for earliest and latest departures.
+        # Keeping them per date means an update only moves the departures of one day
+        self._departures: dict[tuple, dict[datetime.date, list[tuple]]] = defaultdict(dict)
+
+        for flight in flights:
+            self.add_flight(flight)
+
+    def add_flight(self, flight: dict[str, Optional[str]]) -> None:
+        """
+        Adds a flight to the aggregates
+
+        Args:
+            flight (dict[str, Optional[str]]): the flight added to the database
+        """
+
+        flight_date = flight["date"]
+        departure = (flight["time"], flight["flight_number"], flight["origin"], flight["destination"])
+
+        for key in route_keys(flight):
+            self._totals[key] += 1
+            self._date_counts[key].add(flight_date, 1)
+            self._hourly_counts[key][flight["time"].hour].add(flight_date, 1)
+
+            daily_counts = self._daily_counts[key]
+            if flight_date not in daily_counts:
+                daily_counts[flight_date] = 0
+                self._departures[key][flight_date] = []
+                insort(self._dates[key], flight_date)
+            daily_counts[flight_date] += 1
+
+            insort(self._departures[key][flight_date], departure)
+
+    def remove_flight(self, flight: dict[str, Optional[str]]) -> None:
+        """
+        Removes a flight from the aggregates
+
+        Args:
+            flight (dict[str, Optional[str]]): the flight removed from the database
+
+        Raises:
+            ValueError: If the flight was never added
+        """
+
+        flight_date = flight["date"]
+        departure = (flight["time"], flight["flight_number"], flight["origin"], flight["destination"])
+
+        # A flight is stored under all of its keys or none, so checking the first one is enough
+        # and nothing is changed if the flight is missing
+        departures = self._departures.get(route_keys(flight)[0], {}).get(flight_date, [])
+        index = bisect_left(departures, departure)
+        if index == len(departures) or departures[index] != departure:
+            raise ValueError(f"Flight {flight['flight_number']} is not in the aggregates")
+
+        for key in route_keys(flight):
+            departures = self._departures[key][flight_date]
+            del departures[bisect_left(departures, departure)]
+
+            self._totals[key] -= 1
+            self._date_counts[key].add(flight_date, -1)
+            self._hourly_counts[key][flight["time"].hour].add(flight_date, -1)
+            self._daily_counts[key][flight_date] -= 1
+
+            # Forget dates without flights so date ranges only contain dates with flights
+            if self._daily_counts[key][flight_date] == 0:
+                del self._daily_counts[key][flight_date]
+                del self._departures[key][flight_date]
+                dates = self._dates[key]
+                del dates[bisect_left(dates, flight_date)]
+
+    def count(
+        self,
+        origin: Optional[str] = None,
+        destination: Optional[str] = None,
+        after_date: Optional[datetime.date] = None,
+        before_date: Optional[datetime.date] = None
+    ) -> int:
+        """
+        Counts the flights matching a route between two dates, both inclusive
+
+        Args:
+            origin (Optional[str]): the city the flights leave from or None for any
+            destination (Optional[str]): the city the flights go to or None for any
+            after_date (Optional[datetime.date]): the first date to count or None for no limit
+            before_date (Optional[datetime.date]): the last date to count or None for no limit
+
+        Returns:
+            int: the number of matching flights
+        """
+
+        key = (origin and origin.lower(), destination and destination.lower())
+        if after_date is None and before_date is None:
+            return self._totals.get(key, 0)
+
+        date_counts = self._date_counts.get(key)
+        if date_counts is None:
+            return 0
+        return date_counts.range_sum(after_date, before_date)
+
+    def counts_by_date(
+        self,
+        origin: Optional[str] = None,
+        destination: Optional[str] = None,
+        after_date: Optional[datetime.date] = None,
+        before_date: Optional[datetime.date] = None
+    ) -> dict[datetime.date, int]:
+        """
+        Counts the flights matching a route on each date between two dates, both inclusive
+
+        Args:
+            origin (Optional[str]): the city the flights leave from or None for any
+            destination (Optional[str]): the city the flights go to or None for any
+            after_date (Optional[datetime.date]): the first date to count or None for no limit
+            before_date (Optional[datetime.date]): the last date to count or None for no limit
+
+        Returns:
+            dict[datetime.date, int]: the number of flights on each date that has flights
+        """
+
+        key = (origin and origin.lower(), destination and destination.lower())
+        dates = self._dates.get(key, [])
+        daily_counts = self._daily_counts.get(key, {})
+
+        start = 0 if after_date is None else bisect_left(dates, after_date)
+        end = len(dates) if before_date is None else bisect_right(dates, before_date)
+        return {flight_date: daily_counts[flight_date] for flight_date in dates[start:end]}
+
+    def counts_by_hour(
+        self,
+        origin: Optional[str] = None,
+        destination: Optional[str] = None,
+        after_date: Optional[datetime.date] = None,
+        before_date: Optional[datetime.date] = None
+    ) -> dict[int, int]:
+        """
+        Counts the flights matching a route departing in each hour of the day between two dates, both inclusive
+
+        Args:
+            origin (Optional[str]): the city the flights leave from or None for any
+            destination (Optional[str]): the city the flights go to or None for any
+            after_date (Optional[datetime.date]): the first date to count or None for no limit
+            before_date (Optional[datetime.date]): the last date to count or None for no limit
+
+        Returns:
+            dict[int, int]: the number of flights departing in each hour that has flights
+        """
+
+        key = (origin and origin.lower(), destination and destination.lower())
+        hourly_counts = self._hourly_counts.get(key)
+        if hourly_counts is None:
+            return {}
+
+        counts = {hour: date_counts.range_sum(after_date, before_date) for hour, date_counts in enumerate(hourly_counts)}
+        return {hour: count for hour, count in counts.items() if count}
+
+    def _departure_to_flight(self, flight_date: datetime.date, departure: tuple) -> dict[str, Optional[str]]:
+        """
+        Converts a stored departure back to a flight dictionary
+        """
+
+        flight_time, flight_number, origin, destination = departure
+        return {
+            "flight_number": flight_number,
+            "origin": origin,
+            "destination": destination,
+            "date": flight_date,
+            "time": flight_time,
+        }
+
+    def earliest(
+        self,
+        origin: Optional[str] = None,
+        destination: Optional[str] = None,
+        after_date: Optional[datetime.date] = None,
+        before_date: Optional[datetime.date] = None
+    ) -> Optional[dict[str, Optional[str]]]:
+        """
+        Finds the earliest departure for a route between two dates, both inclusive
+
+        Args:
+            origin (Optional[str]): the city the flights leave from or None for any
+            destination (Optional[str]): the city the flights go to or None for any
+            after_date (Optional[datetime.date]): the first date to look at or None for no limit
+            before_date (Optional[datetime.date]): the last date to look at or None for no limit
+
+        Returns:
+            Optional[dict[str, Optional[str]]]: the earliest flight or None if there are no flights
+        """
+
+        key = (origin and origin.lower(), destination and destination.lower())
+        dates = self._dates.get(key, [])
+
+        index = 0 if after_date is None else bisect_left(dates, after_date)
+        if index == len(dates):
+            return None
+
+        flight_date = dates[index]
+        if before_date is not None and flight_date > before_date:
+            return None
+        return self._departure_to_flight(flight_date, self._departures[key][flight_date][0])
+
+    def latest(
+        self,
+        origin: Optional[str] = None,
+        destination: Optional[str] = None,
+        after_date: Optional[datetime.date] = None,
+        before_date: Optional[datetime.date] = None
+    ) -> Optional[dict[str, Optional[str]]]:
+        """
+        Finds the latest departure for a route between two dates, both inclusive
+
+        Args:
+            origin (Optional[str]): the city the flights leave from or None for any
+            destination (Optional[str]): the city the flights go to or None for any
+            after_date (Optional[datetime.date]): the first date to look at or None for no limit
+            before_date (Optional[datetime.date]): the last date to look at or None for no limit
+
+        Returns:
+            Optional[dict[str, Optional[str]]]: the latest flight or None if there are no flights
+        """
+
+        key = (origin and origin.lower(), destination and destination.lower())
+        dates = self._dates.get(key, [])
+
+        index = (len(dates) if before_date is None else bisect_right(dates, before_date)) - 1
+        if index < 0:
+            return None
+
+        flight_date = dates[index]
+        if after_date is not None and flight_date < after_date:
+            return None
+        return self._departure_to_flight(flight_date, self._departures[key][flight_date][-1])
+
+    def summarise(self, parameters: dict[str, Optional[str]]) -> Optional[dict]:
+        """
+        Answers an aggregate question from the aggregates, giving a compact summary
+        instead of every matching flight
+
+        Args:
+            parameters (dict[str, Optional[str]]): A dictionary containing parameters for searching flights,
+                with the kind of question under the "aggregate" key
+
+        Returns:
+            Optional[dict]: a summary of the matching flights, or None if the question
+            can't be answered from the aggregates
+        """
+
+        intent = parameters.get("aggregate")
+        if intent not in AGGREGATE_INTENTS:
+            return None
+        if any(parameters.get(key) is not None for key in UNSUPPORTED_KEYS):
+            return None
+
+        origin = parameters.get("origin")
+        destination = parameters.get("destination")
+        date = convert_date(parameters.get("date"))
+        after_date = date or convert_date(parameters.get("after_date"))
+        before_date = date or convert_date(parameters.get("before_date"))
+
+        summary = {
+            "question": intent,
+            "origin": origin,
+            "destination": destination,
+            "from_date": after_date and after_date.isoformat(),
+            "to_date": before_date and before_date.isoformat(),
+        }
+
+        if intent == "count":
+            summary["number_of_flights"] = self.count(origin, destination, after_date, before_date)
+
+        elif intent == "busiest_day":
+            counts = self.counts_by_date(origin, destination, after_date, before_date)
+            summary["flights_per_date"] = {flight_date.isoformat(): count for flight_date, count in counts.items()}
+            if counts:
+                summary["busiest_date"] = max(counts, key=counts.get).isoformat()
+
+        elif intent == "busiest_hour":
+            counts = self.counts_by_hour(origin, destination, after_date, before_date)
+            summary["flights_per_hour"] = {f"{hour:02d}:00-{hour:02d}:59": count for hour, count in counts.items()}
+            if counts:
+                busiest_hour = max(counts, key=counts.get)
+                summary["busiest_hour"] = f"{busiest_hour:02d}:00-{busiest_hour:02d}:59"
+
+        else:
+            find = self.earliest if intent == "earliest" else self.latest
+            flight = find(origin, destination, after_date, before_date)
+            summary["flight"] = flight and {
+                **flight,
+                "date": flight["date"].isoformat(),
+                "time": flight["time"].strftime("%H:%M"),
+            }
+
+        return summary
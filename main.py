@@ -1,15 +1,31 @@
-from query_handler import process_response
+from session import FlightSession
 import mdv
 import logging
 
 logging.basicConfig(level=logging.DEBUG)
 
+EXIT_COMMANDS = {"exit", "quit"}
+
 def main():
-    user_query = input("Enter your flight query: ")
-    try:
-        response = process_response(user_query)
-        print(mdv.main(response))
-    except Exception as e:
-        print(f"An error has occured: {e}")
+    # One session for the whole conversation so follow-up questions build on earlier ones
+    session = FlightSession()
+    print("Ask about flights, type 'exit' to quit.")
+
+    while True:
+        try:
+            user_query = input("Enter your flight query: ")
+        except EOFError:
+            break
+
+        if user_query.strip().lower() in EXIT_COMMANDS:
+            break
+        if not user_query.strip():
+            continue
+
+        try:
+            response = session.process_response(user_query)
+            print(mdv.main(response))
+        except Exception as e:
+            print(f"An error has occured: {e}")
 
 main()
\ No newline at end of file
@@ -1,4 +1,5 @@
 from datetime import date, time
+from aggregates import FlightAggregates
 
 flight_data = [
     {"flight_number": "AA101", "origin": "New York", "destination": "London", "date": date(2025, 3, 5), "time": time(10, 0)},
@@ -72,3 +73,44 @@ flight_data = [
     {"flight_number": "QF1818", "origin": "Sydney", "destination": "Melbourne", "date": date(2025, 3, 7), "time": time(16, 25)},
     {"flight_number": "BA1919", "origin": "London", "destination": "New York", "date": date(2025, 3, 7), "time": time(23, 30)}
 ]
+
+# Counts and departures over flight_data, kept up to date by add_flight and remove_flight
+flight_aggregates = FlightAggregates(flight_data)
+
+# Bumped whenever flight_data changes, so cached search results can tell they are out of date
+flight_data_version = 0
+
+def add_flight(flight: dict) -> None:
+    """
+    Adds a flight to the database and updates the aggregates
+
+    Args:
+        flight (dict): the flight to add
+    """
+
+    global flight_data_version
+
+    flight_data.append(flight)
+    flight_aggregates.add_flight(flight)
+    flight_data_version += 1
+
+def remove_flight(flight: dict) -> None:
+    """
+    Removes a flight from the database and updates the aggregates
+
+    Args:
+        flight (dict): the flight to remove
+
+    Raises:
+        ValueError: If the flight is not in the database
+    """
+
+    # Check before changing anything so the database and aggregates can't get out of sync
+    if flight not in flight_data:
+        raise ValueError(f"Flight {flight['flight_number']} is not in the database")
+
+    global flight_data_version
+
+    flight_aggregates.remove_flight(flight)
+    flight_data.remove(flight)
+    flight_data_version += 1
@@ -1,19 +1,45 @@
 import logging
-from mock_database import flight_data
+from mock_database import flight_data, flight_aggregates
 from gemini_api import generate_gemini_response
 import datetime
 import json
 import re
 from utils import convert_date, convert_time
+from response_templates import render_templated_response
 from typing import Optional
 import pprint # Temporarily using so parameters and flights look better when printed
 
-def extract_flight_parameters(user_query: str) -> dict[str, Optional[str]]:
+def format_history(history: Optional[list[tuple[str, str]]]) -> str:
+    """
+    Formats previous turns of a conversation so they can be given to Gemini as context
+
+    Args:
+        history (Optional[list[tuple[str, str]]]): previous (query, response) pairs, oldest first
+
+    Returns:
+        str: the conversation as text, empty if there is no history
+    """
+
+    if not history:
+        return ""
+
+    return "\n".join(
+        f"User: {previous_query}\nAssistant: {previous_response}"
+        for previous_query, previous_response in history
+    )
+
+def extract_flight_parameters(
+    user_query: str,
+    previous_parameters: Optional[dict[str, Optional[str]]] = None,
+    history: Optional[list[tuple[str, str]]] = None
+) -> dict[str, Optional[str]]:
     """
     Extract flight information from a users query using Gemini 
 
     Args:
         user_query (str): the users query about flight information
+        previous_parameters (Optional[dict[str, Optional[str]]]): parameters of the previous search if the query is a follow-up
+        history (Optional[list[tuple[str, str]]]): previous (query, response) pairs of the conversation
 
     Returns:
         dict[str, Optional[str]]: a dictionary containing flight parameters
@@ -22,10 +48,39 @@ def extract_flight_parameters(user_query: str) -> dict[str, Optional[str]]:
     # Get todays date so gemini knows what todays date and can use that information to answer time relative questions
     today = datetime.datetime.now().strftime("%Y-%m-%d") 
 
-    prompt = f"""
+    # Follow-up queries only need to return what they change, the rest is carried over from the previous search.
+    # Assuming today for a follow-up would replace the date of the previous search, so that's only done for new queries.
+    # Counting and summary questions keep their dates open unless given, otherwise they'd only look at today
+    if previous_parameters is None:
+        context = f"""
     Today's date is {today}. If the user's query refers to a time (e.g., '10 am') or a location but does not mention a specific date, assume they are referring to today.
+    This doesn't apply when aggregate is set: for counting and summary questions only set dates the user gives.
+    If the user's query is in another language, put the parameters in english
+    """
+        follow_up_keys = ""
+    else:
+        context = f"""
+    Today's date is {today}.
     If the user's query is in another language, put the parameters in english
 
+    This query is a follow-up in a conversation. Here is the conversation so far:
+    {format_history(history)}
+
+    The previous search used these parameters: {json.dumps(previous_parameters)}
+    Resolve anything relative to the previous search (e.g. 'the day after', 'only the morning ones') using these parameters.
+    Only fill in the keys the new query adds or changes, set everything else to null.
+    Always set language for the new query.
+    Always set aggregate for the new query, e.g. 'what about tomorrow' after 'how many flights leave London' is still a count.
+    If the query is a new question that doesn't build on the previous search, extract it as if it were the first query,
+    assuming today if it refers to a time or a location but does not mention a specific date,
+    unless aggregate is set: for counting and summary questions only set dates the user gives.
+    """
+        follow_up_keys = """
+    - new_search: true if the query is a new question that doesn't build on the previous search, otherwise false
+    - clear: list of the keys the user no longer wants to filter on (e.g. ["date"] for 'any day'), or an empty list
+    """
+
+    prompt = f"""{context}
     Extract flight information from the following query:
     "{user_query}"
     
@@ -39,7 +94,13 @@ def extract_flight_parameters(user_query: str) -> dict[str, Optional[str]]:
     - after_date: str in YYYY-MM-DD format or null
     - before_time: str in HH:MM format or null
     - after_time: str in HH:MM format or null
-    """
+    - aggregate: one of the following or null
+        - "count" if the user asks how many flights there are
+        - "busiest_day" if the user asks which day has the most or fewest flights
+        - "busiest_hour" if the user asks which time of day has the most or fewest flights
+        - "earliest" if the user asks for the earliest or first flight
+        - "latest" if the user asks for the latest or last flight
+    - language: the ISO 639-1 code of the language the query is written in e.g. "en"{follow_up_keys}"""
 
     response = generate_gemini_response(prompt)
 
@@ -54,12 +115,16 @@ def extract_flight_parameters(user_query: str) -> dict[str, Optional[str]]:
     except Exception as e:
         raise ValueError(f"Failed to parse Gemini response: {e}")
 
-def search_flights(parameters: dict[str, Optional[str]]) -> list[dict[str, Optional[str]]]:
+def filter_flights(
+    flights: list[dict[str, Optional[str]]],
+    parameters: dict[str, Optional[str]]
+) -> list[dict[str, Optional[str]]]:
     """
-    Given parameters it searches a mock database of flights to find flights matching
+    Given parameters it filters a list of flights down to the flights matching
     those parameters
 
     Args:
+        flights (list[dict[str, Optional[str]]]): The flights to filter
         parameters (dict[str, Optional[str]]): A dictionary containing parameters for searching flights
 
     Returns:
@@ -79,7 +144,7 @@ def search_flights(parameters: dict[str, Optional[str]]) -> list[dict[str, Optio
 
     # Find flights matching the given parameters and intervals
     return [
-        flight for flight in flight_data
+        flight for flight in flights
         if (flight_number is None or flight.get('flight_number') == flight_number)
         and (origin is None or flight.get('origin').lower() == origin.lower())
         and (destination is None or flight.get('destination').lower() == destination.lower())
@@ -91,26 +156,53 @@ def search_flights(parameters: dict[str, Optional[str]]) -> list[dict[str, Optio
         and (after_time is None or flight.get('time') >= after_time)
     ]
 
-def process_response(query: str) -> str:
+def search_flights(parameters: dict[str, Optional[str]]) -> list[dict[str, Optional[str]]]:
     """
-    Processes a user's query by extracting the parameters, searching for
-    relevant flight information and generating a response from Gemini 
-    using that information
+    Given parameters it searches a mock database of flights to find flights matching
+    those parameters
+
+    Args:
+        parameters (dict[str, Optional[str]]): A dictionary containing parameters for searching flights
+
+    Returns:
+        list[dict[str, Optional[str]]]: A list of flights matching the given criteria
+    """
+
+    return filter_flights(flight_data, parameters)
+
+def generate_answer(
+    query: str,
+    parameters: dict[str, Optional[str]],
+    flights: list[dict[str, Optional[str]]],
+    history: Optional[list[tuple[str, str]]] = None
+) -> str:
+    """
+    Answers a user's query using the flights found for it, from a template
+    when possible otherwise from Gemini
 
     Args:
         query (str): The user's query about flight information
+        parameters (dict[str, Optional[str]]): The parameters used to search for flights
+        flights (list[dict[str, Optional[str]]]): The flights matching the parameters
+        history (Optional[list[tuple[str, str]]]): previous (query, response) pairs of the conversation
 
     Returns:
-        str: Gemini's answer to the users query using relevant flight information
+        str: the answer to the users query
     """
 
-    parameters = extract_flight_parameters(query)
-    logging.info(f"\n Parameters:\n {pprint.pformat(parameters)}")
+    templated_response = render_templated_response(query, parameters, flights)
+    if templated_response is not None:
+        logging.info("Answered using a template, skipping Gemini")
+        return templated_response
 
-    flights = search_flights(parameters)
-    logging.info(f"\nFlights Found:\n {pprint.pformat(flights)}")
+    conversation = ""
+    if history:
+        conversation = f"""
+    Here is the conversation so far:
+    {format_history(history)}
+    """
 
-    prompt = f"""
+    prompt = f"""{conversation}
     Here is the User's Query: {query}
 
     Here is some Relevant Flight Information we found based on it: {flights}
@@ -120,6 +212,71 @@ def process_response(query: str) -> str:
     Remember you are speaking directly to the user.
     """
 
-    response = generate_gemini_response(prompt)
+    return generate_gemini_response(prompt)
+
+def generate_aggregate_answer(
+    query: str,
+    summary: dict,
+    history: Optional[list[tuple[str, str]]] = None
+) -> str:
+    """
+    Answers a counting or summary question using a summary from the aggregates
+    rather than every matching flight
+
+    Args:
+        query (str): The user's query about flight information
+        summary (dict): The summary of the matching flights from FlightAggregates.summarise
+        history (Optional[list[tuple[str, str]]]): previous (query, response) pairs of the conversation
+
+    Returns:
+        str: Gemini's answer to the users query
+    """
+
+    conversation = ""
+    if history:
+        conversation = f"""
+    Here is the conversation so far:
+    {format_history(history)}
+    """
+
+    prompt = f"""{conversation}
+    Here is the User's Query: {query}
+
+    Here is a summary of the flights matching their query, a null origin, destination or date means any: {json.dumps(summary)}
+
+    Now you should answer their question using the given summary.
+
+    Remember you are speaking directly to the user.
+    """
+
+    return generate_gemini_response(prompt)
+
+def process_response(query: str) -> str:
+    """
+    Processes a user's query by extracting the parameters, searching for
+    relevant flight information and generating a response from Gemini 
+    using that information. Simple results are answered from a template
+    so the second Gemini call is skipped and counting or summary questions
+    are answered from the aggregates. Each query is handled on its own,
+    see session.FlightSession for follow-up questions
+
+    Args:
+        query (str): The user's query about flight information
+
+    Returns:
+        str: Gemini's answer to the users query using relevant flight information
+    """
+
+    parameters = extract_flight_parameters(query)
+    logging.info(f"\n Parameters:\n {pprint.pformat(parameters)}")
+
+    # Counting and summary questions are answered from the aggregates without searching
+    summary = flight_aggregates.summarise(parameters)
+    if summary is not None:
+        logging.info(f"\nAggregate Summary:\n {pprint.pformat(summary)}")
+        return generate_aggregate_answer(query, summary)
+
+    flights = search_flights(parameters)
+    logging.info(f"\nFlights Found:\n {pprint.pformat(flights)}")
 
-    return response
\ No newline at end of file
+    return generate_answer(query, parameters, flights)
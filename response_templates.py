@@ -0,0 +1,194 @@
+import datetime
+import re
+from itertools import groupby
+from typing import Optional
+from utils import convert_date, convert_time
+
+# Above this many flights a plain list stops being helpful and Gemini is better at summarising
+MAX_TEMPLATED_FLIGHTS = 10
+
+# Words that mean the user wants some reasoning over the flights rather than just a listing
+REASONING_KEYWORDS = {
+    "earliest", "latest", "first", "last", "cheapest", "fastest", "shortest", "longest",
+    "best", "next", "soonest", "compare", "difference", "why", "how", "should", "recommend",
+    "most", "least",
+}
+
+def format_date(flight_date: datetime.date) -> str:
+    """
+    Formats a date in a readable way e.g. Wednesday 5 March 2025
+
+    Args:
+        flight_date (datetime.date): the date to format
+
+    Returns:
+        str: the formatted date
+    """
+
+    return f"{flight_date:%A} {flight_date.day} {flight_date:%B %Y}"
+
+def format_time(flight_time: datetime.time) -> str:
+    """
+    Formats a time in the 24 hour format HH:MM
+
+    Args:
+        flight_time (datetime.time): the time to format
+
+    Returns:
+        str: the formatted time
+    """
+
+    return flight_time.strftime("%H:%M")
+
+def describe_parameters(parameters: dict[str, Optional[str]]) -> str:
+    """
+    Builds a short description of the search criteria e.g. "from London to Paris on Wednesday 5 March 2025"
+
+    Args:
+        parameters (dict[str, Optional[str]]): the parameters used to search for flights
+
+    Returns:
+        str: a description of the criteria, empty if no criteria were given
+    """
+
+    # Each key with its template and how its value is formatted
+    descriptions = {
+        "flight_number": ("numbered {}", None),
+        "origin": ("from {}", None),
+        "destination": ("to {}", None),
+        "date": ("on {}", (convert_date, format_date)),
+        "time": ("at {}", (convert_time, format_time)),
+        "after_date": ("on or after {}", (convert_date, format_date)),
+        "before_date": ("on or before {}", (convert_date, format_date)),
+        "after_time": ("at or after {}", (convert_time, format_time)),
+        "before_time": ("at or before {}", (convert_time, format_time)),
+    }
+
+    criteria = []
+    for key, (template, formatting) in descriptions.items():
+        value = parameters.get(key)
+        if value is None:
+            continue
+
+        if formatting is not None:
+            convert, format_value = formatting
+            converted = convert(value)
+            # Keep the value as given if it can't be converted
+            if converted is not None:
+                value = format_value(converted)
+
+        criteria.append(template.format(value))
+
+    return " ".join(criteria)
+
+def render_no_results(parameters: dict[str, Optional[str]]) -> str:
+    """
+    Renders the answer for when no flights matched the search
+
+    Args:
+        parameters (dict[str, Optional[str]]): the parameters used to search for flights
+
+    Returns:
+        str: a markdown answer telling the user nothing was found
+    """
+
+    criteria = describe_parameters(parameters)
+    if criteria:
+        return f"Sorry, I couldn't find any flights {criteria}."
+    return "Sorry, I couldn't find any flights."
+
+def render_single_flight(flight: dict[str, Optional[str]]) -> str:
+    """
+    Renders the answer for a single flight
+
+    Args:
+        flight (dict[str, Optional[str]]): the flight that matched the search
+
+    Returns:
+        str: a markdown answer describing the flight
+    """
+
+    return (
+        f"Flight **{flight['flight_number']}** from {flight['origin']} to {flight['destination']} "
+        f"departs on {format_date(flight['date'])} at {format_time(flight['time'])}."
+    )
+
+def render_flights_by_date(flights: list[dict[str, Optional[str]]]) -> str:
+    """
+    Renders the answer for a short list of flights, grouped by date and sorted by departure
+
+    Args:
+        flights (list[dict[str, Optional[str]]]): the flights that matched the search
+
+    Returns:
+        str: a markdown answer listing the flights under a heading for each date
+    """
+
+    sorted_flights = sorted(flights, key=lambda flight: (flight["date"], flight["time"]))
+
+    lines = [f"I found {len(flights)} flights:"]
+    for flight_date, flights_on_date in groupby(sorted_flights, key=lambda flight: flight["date"]):
+        lines.append("")
+        lines.append(f"### {format_date(flight_date)}")
+        for flight in flights_on_date:
+            lines.append(
+                f"- **{flight['flight_number']}** {flight['origin']} to {flight['destination']} "
+                f"at {format_time(flight['time'])}"
+            )
+
+    return "\n".join(lines)
+
+def should_use_template(
+    query: str,
+    parameters: dict[str, Optional[str]],
+    flights: list[dict[str, Optional[str]]]
+) -> bool:
+    """
+    Decides whether a query can be answered with a template instead of asking Gemini.
+    Templates are only used for short results in English where the user just wants to see the flights
+
+    Args:
+        query (str): the user's query about flight information
+        parameters (dict[str, Optional[str]]): the parameters extracted from the query, including its language
+        flights (list[dict[str, Optional[str]]]): the flights that matched the search
+
+    Returns:
+        bool: True if a templated answer is good enough otherwise False
+    """
+
+    if len(flights) > MAX_TEMPLATED_FLIGHTS:
+        return False
+
+    # Gemini answers in the user's language, the templates only speak English
+    language = parameters.get("language")
+    if language is None or language.lower() != "en":
+        return False
+
+    words = set(re.findall(r"[a-z]+", query.lower()))
+    return not (words & REASONING_KEYWORDS)
+
+def render_templated_response(
+    query: str,
+    parameters: dict[str, Optional[str]],
+    flights: list[dict[str, Optional[str]]]
+) -> Optional[str]:
+    """
+    Renders a deterministic markdown answer for common result shapes
+
+    Args:
+        query (str): the user's query about flight information
+        parameters (dict[str, Optional[str]]): the parameters used to search for flights
+        flights (list[dict[str, Optional[str]]]): the flights that matched the search
+
+    Returns:
+        Optional[str]: the templated answer, or None if Gemini should answer instead
+    """
+
+    if not should_use_template(query, parameters, flights):
+        return None
+
+    if not flights:
+        return render_no_results(parameters)
+    if len(flights) == 1:
+        return render_single_flight(flights[0])
+    return render_flights_by_date(flights)
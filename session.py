@@ -0,0 +1,205 @@
+import logging
+import pprint
+from collections import deque
+from typing import Optional
+import mock_database
+from mock_database import flight_aggregates
+from query_handler import (
+    extract_flight_parameters,
+    filter_flights,
+    search_flights,
+    generate_answer,
+    generate_aggregate_answer
+)
+from utils import convert_date, convert_time
+
+# How many previous turns of the conversation are sent to Gemini as context
+MAX_HISTORY_TURNS = 3
+
+# Keys that must match exactly, cities are compared case insensitively like filter_flights does
+EXACT_KEYS = ("flight_number", "origin", "destination")
+CASE_INSENSITIVE_KEYS = ("origin", "destination")
+
+# Keys only returned for follow-up queries, telling how to merge them rather than what to search for
+FOLLOW_UP_KEYS = ("new_search", "clear")
+
+# Each exact key with its (before, after) interval keys and the function used to parse its values
+INTERVAL_KEYS = {
+    "date": ("before_date", "after_date", convert_date),
+    "time": ("before_time", "after_time", convert_time),
+}
+
+def merge_parameters(
+    previous: dict[str, Optional[str]],
+    new: dict[str, Optional[str]]
+) -> dict[str, Optional[str]]:
+    """
+    Merges the parameters extracted from a follow-up query into the parameters of the previous search.
+    Keys set in the new parameters replace the previous ones. An exact date or time replaces a previous
+    interval and an interval replaces a previous exact value. A new search drops the previous parameters
+    and the keys listed under "clear" are removed
+
+    Args:
+        previous (dict[str, Optional[str]]): the parameters of the previous search
+        new (dict[str, Optional[str]]): the parameters extracted from the follow-up query
+
+    Returns:
+        dict[str, Optional[str]]: the merged parameters
+    """
+
+    if new.get("new_search"):
+        merged = {key: None for key in previous}
+    else:
+        merged = dict(previous)
+
+        for key in new.get("clear") or []:
+            if key not in merged:
+                continue
+            merged[key] = None
+            # Clearing a date or time also clears its interval e.g. "any day"
+            if key in INTERVAL_KEYS:
+                before_key, after_key, _ = INTERVAL_KEYS[key]
+                merged[before_key] = None
+                merged[after_key] = None
+
+    for exact_key, (before_key, after_key, _) in INTERVAL_KEYS.items():
+        if new.get(exact_key) is not None:
+            merged[before_key] = None
+            merged[after_key] = None
+        elif new.get(before_key) is not None or new.get(after_key) is not None:
+            merged[exact_key] = None
+
+    merged.update({
+        key: value for key, value in new.items()
+        if value is not None and key not in FOLLOW_UP_KEYS
+    })
+
+    # The kind of question and its language belong to each query, Gemini sets them again for every follow-up
+    merged["aggregate"] = new.get("aggregate")
+    merged["language"] = new.get("language")
+    return merged
+
+def is_narrowing(previous: dict[str, Optional[str]], new: dict[str, Optional[str]]) -> bool:
+    """
+    Checks if the new parameters can only match flights that the previous parameters matched,
+    in which case the previous results can be filtered instead of searching again
+
+    Args:
+        previous (dict[str, Optional[str]]): the parameters of the previous search
+        new (dict[str, Optional[str]]): the parameters of the new search
+
+    Returns:
+        bool: True if every flight matching the new parameters also matches the previous ones
+    """
+
+    for key in EXACT_KEYS:
+        previous_value = previous.get(key)
+        new_value = new.get(key)
+        if previous_value is None:
+            continue
+        if new_value is None:
+            return False
+        if key in CASE_INSENSITIVE_KEYS:
+            previous_value = previous_value.lower()
+            new_value = new_value.lower()
+        if new_value != previous_value:
+            return False
+
+    for exact_key, (before_key, after_key, convert) in INTERVAL_KEYS.items():
+        new_exact = convert(new.get(exact_key))
+
+        previous_exact = convert(previous.get(exact_key))
+        if previous_exact is not None and new_exact != previous_exact:
+            return False
+
+        # An exact value is also an upper and lower bound
+        previous_before = convert(previous.get(before_key))
+        new_before = convert(new.get(before_key)) or new_exact
+        if previous_before is not None and (new_before is None or new_before > previous_before):
+            return False
+
+        previous_after = convert(previous.get(after_key))
+        new_after = convert(new.get(after_key)) or new_exact
+        if previous_after is not None and (new_after is None or new_after < previous_after):
+            return False
+
+    return True
+
+class FlightSession:
+    """
+    Keeps track of a conversation with the user so follow-up questions like
+    "only the morning ones" or "what about the day after" build on the previous search
+    """
+
+    def __init__(self, max_history_turns: int = MAX_HISTORY_TURNS):
+        """
+        Args:
+            max_history_turns (int): how many previous turns are sent to Gemini as context
+        """
+
+        self.parameters: Optional[dict[str, Optional[str]]] = None
+        self.flights: Optional[list[dict[str, Optional[str]]]] = None
+        # The version of the flight database self.flights was found in
+        self.flights_version: Optional[int] = None
+        self.history: deque[tuple[str, str]] = deque(maxlen=max_history_turns)
+
+    def find_flights(self, parameters: dict[str, Optional[str]]) -> list[dict[str, Optional[str]]]:
+        """
+        Finds the flights matching the parameters, filtering the previous results when
+        the parameters narrow the previous search and the database hasn't changed since,
+        otherwise searching all flights
+
+        Args:
+            parameters (dict[str, Optional[str]]): A dictionary containing parameters for searching flights
+
+        Returns:
+            list[dict[str, Optional[str]]]: A list of flights matching the given criteria
+        """
+
+        if (
+            self.flights is not None
+            and self.flights_version == mock_database.flight_data_version
+            and is_narrowing(self.parameters, parameters)
+        ):
+            logging.info("Parameters narrow the previous search, filtering previous results")
+            return filter_flights(self.flights, parameters)
+
+        return search_flights(parameters)
+
+    def process_response(self, query: str) -> str:
+        """
+        Processes a user's query in the context of the conversation so far by extracting
+        the parameters, merging them with the previous ones, finding the matching flights
+        and generating an answer. Counting and summary questions are answered from the aggregates
+
+        Args:
+            query (str): The user's query about flight information
+
+        Returns:
+            str: the answer to the users query using relevant flight information
+        """
+
+        history = list(self.history)
+
+        parameters = extract_flight_parameters(query, self.parameters, history)
+        if self.parameters is not None:
+            parameters = merge_parameters(self.parameters, parameters)
+        logging.info(f"\n Parameters:\n {pprint.pformat(parameters)}")
+
+        summary = flight_aggregates.summarise(parameters)
+        if summary is not None:
+            logging.info(f"\nAggregate Summary:\n {pprint.pformat(summary)}")
+            response = generate_aggregate_answer(query, summary, history)
+            # No flights were fetched so the next query has to search
+            flights = None
+        else:
+            flights = self.find_flights(parameters)
+            logging.info(f"\nFlights Found:\n {pprint.pformat(flights)}")
+            response = generate_answer(query, parameters, flights, history)
+
+        self.parameters = parameters
+        self.flights = flights
+        self.flights_version = mock_database.flight_data_version
+        self.history.append((query, response))
+
+        return response
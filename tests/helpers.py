@@ -0,0 +1,24 @@
+import datetime
+
+# Parameters as returned by extract_flight_parameters when the query has no criteria
+EMPTY_PARAMETERS = {
+    "flight_number": None,
+    "origin": None,
+    "destination": None,
+    "date": None,
+    "time": None,
+    "before_date": None,
+    "after_date": None,
+    "before_time": None,
+    "after_time": None,
+}
+
+def make_flight(flight_number, day, hour, minute=0, origin="London", destination="Paris"):
+    # Builds a flight in March 2025 shaped like the ones in mock_database
+    return {
+        "flight_number": flight_number,
+        "origin": origin,
+        "destination": destination,
+        "date": datetime.date(2025, 3, day),
+        "time": datetime.time(hour, minute),
+    }
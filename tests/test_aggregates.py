@@ -0,0 +1,154 @@
+import datetime
+import pytest
+from collections import Counter
+
+import mock_database
+from aggregates import FenwickTree, FlightAggregates
+from mock_database import flight_data, flight_aggregates
+from tests.helpers import make_flight
+
+def matching(origin=None, destination=None, after_date=None, before_date=None):
+    # Brute force search to check the aggregates against
+    return [
+        flight for flight in flight_data
+        if (origin is None or flight["origin"].lower() == origin.lower())
+        and (destination is None or flight["destination"].lower() == destination.lower())
+        and (after_date is None or flight["date"] >= after_date)
+        and (before_date is None or flight["date"] <= before_date)
+    ]
+
+ROUTES = [
+    (None, None, None, None),
+    ("London", None, None, None),
+    (None, "los angeles", None, None),
+    ("New York", "London", None, None),
+    ("Tokyo", None, datetime.date(2025, 3, 5), datetime.date(2025, 3, 6)),
+    (None, "Los Angeles", datetime.date(2025, 3, 6), datetime.date(2025, 3, 6)),
+    ("Nowhere", None, None, None),
+]
+
+# =====================
+# Query Tests
+# =====================
+
+@pytest.mark.parametrize("origin, destination, after_date, before_date", ROUTES)
+def test_count(origin, destination, after_date, before_date):
+    expected = len(matching(origin, destination, after_date, before_date))
+    assert flight_aggregates.count(origin, destination, after_date, before_date) == expected
+
+@pytest.mark.parametrize("origin, destination, after_date, before_date", ROUTES)
+def test_counts_by_date(origin, destination, after_date, before_date):
+    expected = Counter(flight["date"] for flight in matching(origin, destination, after_date, before_date))
+    assert flight_aggregates.counts_by_date(origin, destination, after_date, before_date) == dict(expected)
+
+@pytest.mark.parametrize("origin, destination, after_date, before_date", ROUTES)
+def test_counts_by_hour(origin, destination, after_date, before_date):
+    expected = Counter(flight["time"].hour for flight in matching(origin, destination, after_date, before_date))
+    assert flight_aggregates.counts_by_hour(origin, destination, after_date, before_date) == dict(expected)
+
+@pytest.mark.parametrize("origin, destination, after_date, before_date", ROUTES)
+def test_earliest_and_latest(origin, destination, after_date, before_date):
+    flights = sorted(matching(origin, destination, after_date, before_date), key=lambda f: (f["date"], f["time"]))
+    earliest = flight_aggregates.earliest(origin, destination, after_date, before_date)
+    latest = flight_aggregates.latest(origin, destination, after_date, before_date)
+    if not flights:
+        assert earliest is None and latest is None
+        return
+    assert (earliest["date"], earliest["time"]) == (flights[0]["date"], flights[0]["time"])
+    assert (latest["date"], latest["time"]) == (flights[-1]["date"], flights[-1]["time"])
+
+def test_earliest_and_latest_outside_range():
+    aggregates = FlightAggregates([make_flight("BA1", 5, 10)])
+    assert aggregates.earliest(after_date=datetime.date(2025, 3, 6)) is None
+    assert aggregates.latest(before_date=datetime.date(2025, 3, 4)) is None
+    assert aggregates.latest(after_date=datetime.date(2025, 3, 6)) is None
+
+def test_fenwick_tree_range_sum():
+    tree = FenwickTree()
+    for day, amount in [(1, 2), (3, 5), (4, 1), (31, 7)]:
+        tree.add(datetime.date(2025, 3, day), amount)
+    tree.add(datetime.date(2025, 3, 3), -1)
+
+    assert tree.range_sum(None, None) == 14
+    assert tree.range_sum(datetime.date(2025, 3, 2), datetime.date(2025, 3, 4)) == 5
+    assert tree.range_sum(datetime.date(2025, 3, 4), None) == 8
+    assert tree.range_sum(None, datetime.date(2025, 3, 1)) == 2
+    assert tree.range_sum(datetime.date(2025, 3, 5), datetime.date(2025, 3, 4)) == 0
+
+# =====================
+# Incremental Update Tests
+# =====================
+
+def test_add_and_remove_flight():
+    aggregates = FlightAggregates([make_flight("BA1", 5, 10), make_flight("BA2", 6, 10)])
+    aggregates.add_flight(make_flight("BA3", 6, 8, destination="Rome"))
+
+    assert aggregates.count("london") == 3
+    assert aggregates.count("London", "Paris") == 2
+    assert aggregates.counts_by_date("London") == {datetime.date(2025, 3, 5): 1, datetime.date(2025, 3, 6): 2}
+    assert aggregates.earliest("London", after_date=datetime.date(2025, 3, 6))["flight_number"] == "BA3"
+
+    aggregates.remove_flight(make_flight("BA1", 5, 10))
+    assert aggregates.count("London") == 2
+    assert aggregates.counts_by_date("London") == {datetime.date(2025, 3, 6): 2}
+    assert aggregates.earliest("London")["flight_number"] == "BA3"
+    assert aggregates.latest("London", "Paris")["flight_number"] == "BA2"
+
+def test_remove_missing_flight():
+    aggregates = FlightAggregates([make_flight("BA1", 5, 10)])
+    with pytest.raises(ValueError):
+        aggregates.remove_flight(make_flight("BA2", 5, 10))
+
+def test_database_keeps_aggregates_up_to_date():
+    flight = make_flight("ZZ999", 8, 10, origin="Oslo", destination="Rome")
+    mock_database.add_flight(flight)
+    try:
+        assert flight_aggregates.count("Oslo", "Rome") == 1
+    finally:
+        mock_database.remove_flight(flight)
+    assert flight_aggregates.count("Oslo", "Rome") == 0
+    assert flight not in flight_data
+
+def test_database_remove_missing_flight_changes_nothing():
+    flight = make_flight("ZZ999", 8, 10, origin="Oslo", destination="Rome")
+    total = flight_aggregates.count()
+    with pytest.raises(ValueError):
+        mock_database.remove_flight(flight)
+    assert flight_aggregates.count() == total == len(flight_data)
+
+# =====================
+# Summary Tests
+# =====================
+
+def test_summarise_count():
+    parameters = {"origin": "London", "after_date": "2025-03-03", "before_date": "2025-03-05", "aggregate": "count"}
+    summary = flight_aggregates.summarise(parameters)
+    assert summary["number_of_flights"] == len(
+        matching("London", None, datetime.date(2025, 3, 3), datetime.date(2025, 3, 5))
+    )
+    assert summary["from_date"] == "2025-03-03"
+    assert summary["to_date"] == "2025-03-05"
+
+def test_summarise_busiest_day():
+    summary = flight_aggregates.summarise({"destination": "Los Angeles", "aggregate": "busiest_day"})
+    assert summary["busiest_date"] == "2025-03-06"
+    assert sum(summary["flights_per_date"].values()) == len(matching(destination="Los Angeles"))
+
+def test_summarise_earliest():
+    summary = flight_aggregates.summarise({"origin": "New York", "destination": "London", "aggregate": "earliest"})
+    assert summary["flight"] == {
+        "flight_number": "AA101",
+        "origin": "New York",
+        "destination": "London",
+        "date": "2025-03-05",
+        "time": "10:00",
+    }
+
+@pytest.mark.parametrize("parameters, description", [
+    ({"origin": "London"}, "No aggregate question"),
+    ({"origin": "London", "aggregate": "cheapest"}, "Unknown aggregate question"),
+    ({"origin": "London", "after_time": "12:00", "aggregate": "count"}, "Times aren't aggregated"),
+    ({"flight_number": "AA101", "aggregate": "count"}, "Flight numbers aren't aggregated"),
+])
+def test_summarise_unsupported(parameters, description):
+    assert flight_aggregates.summarise(parameters) is None, description
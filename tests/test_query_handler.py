@@ -23,7 +23,8 @@ def dummy_generate_gemini_response(prompt: str) -> str:
             "before_date": None,
             "after_date": None,
             "before_time": None,
-            "after_time": None
+            "after_time": None,
+            "language": "en"
         })
     else:
         return "Final dummy response using flight data."
@@ -98,6 +99,23 @@ def test_extract_flight_parameters_with_markdown(set_dummy_gemini):
     assert params.get("date") == "2025-03-03"
     assert params.get("time") == "14:55"
 
+def test_extract_flight_parameters_aggregates_keep_dates_open(set_dummy_gemini):
+    # Assuming today would limit "which day has the most flights" to a single day.
+    prompts = []
+    def dummy(prompt: str) -> str:
+        prompts.append(prompt)
+        return dummy_generate_gemini_response(prompt)
+
+    set_dummy_gemini(dummy)
+    extract_flight_parameters("Which day has the most flights to Los Angeles?")
+    extract_flight_parameters("How many flights leave Tokyo?", previous_parameters={"origin": "London"}, history=[])
+
+    aggregate_exception = "for counting and summary questions only set dates the user gives"
+    first_prompt, follow_up_prompt = prompts
+    assert "assume they are referring to today" in first_prompt
+    assert aggregate_exception in first_prompt
+    assert aggregate_exception in follow_up_prompt
+
 # =====================
 # Search Tests
 # =====================
@@ -208,14 +226,46 @@ def test_search_flights_case_insensitive():
 
 def test_process_response_success(set_dummy_gemini):
     # Both extraction and final response use the dummy.
+    # Asking for the earliest flight needs reasoning so Gemini answers rather than a template.
     set_dummy_gemini(dummy_generate_gemini_response)
-    query = "What are the flights from New York to London?"
+    query = "What is the earliest flight from New York to London?"
     response = process_response(query)
     assert response == "Final dummy response using flight data."
 
+def test_process_response_uses_template(set_dummy_gemini):
+    # Only the extraction call should reach Gemini when a template can answer.
+    prompts = []
+    def dummy(prompt: str) -> str:
+        prompts.append(prompt)
+        return dummy_generate_gemini_response(prompt)
+
+    set_dummy_gemini(dummy)
+    query = "What are the flights from New York to London?"
+    response = process_response(query)
+    assert "**AA101**" in response
+    assert len(prompts) == 1
+
 def test_process_response_failure(set_dummy_gemini):
     # Simulate an error in the Gemini API call during the final response.
     set_dummy_gemini(dummy_generate_exception)
     query = "What are the flights from New York to London?"
     with pytest.raises(Exception, match="Gemini API error"):
-        process_response(query)
\ No newline at end of file
+        process_response(query)
+
+def test_process_response_uses_aggregates(set_dummy_gemini, monkeypatch):
+    # Counting questions are answered from a summary without searching every flight.
+    prompts = []
+    def dummy(prompt: str) -> str:
+        prompts.append(prompt)
+        if "Extract flight information" in prompt:
+            return json.dumps({"origin": "London", "destination": None, "aggregate": "count"})
+        return "There are 9 flights."
+
+    def fail_search(parameters):
+        raise AssertionError("search_flights should not be called")
+
+    set_dummy_gemini(dummy)
+    monkeypatch.setattr("query_handler.search_flights", fail_search)
+    response = process_response("How many flights leave London?")
+    assert response == "There are 9 flights."
+    assert '"number_of_flights": ' in prompts[-1]
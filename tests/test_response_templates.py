@@ -0,0 +1,94 @@
+import pytest
+
+from response_templates import (
+    MAX_TEMPLATED_FLIGHTS,
+    describe_parameters,
+    render_flights_by_date,
+    render_no_results,
+    render_single_flight,
+    render_templated_response,
+    should_use_template
+)
+from tests.helpers import EMPTY_PARAMETERS, make_flight
+
+# =====================
+# Rendering Tests
+# =====================
+
+ENGLISH_PARAMETERS = {**EMPTY_PARAMETERS, "language": "en"}
+
+def test_describe_parameters():
+    parameters = {**EMPTY_PARAMETERS, "origin": "London", "destination": "Paris", "after_time": "14:00"}
+    assert describe_parameters(parameters) == "from London to Paris at or after 14:00"
+
+def test_describe_parameters_formats_dates_and_times():
+    parameters = {**EMPTY_PARAMETERS, "after_date": "2025-03-05", "before_date": "2025-03-06", "time": "09:05:00"}
+    assert describe_parameters(parameters) == (
+        "at 09:05 on or after Wednesday 5 March 2025 on or before Thursday 6 March 2025"
+    )
+
+def test_describe_parameters_keeps_invalid_dates():
+    parameters = {**EMPTY_PARAMETERS, "date": "next tuesday"}
+    assert describe_parameters(parameters) == "on next tuesday"
+
+def test_describe_parameters_empty():
+    assert describe_parameters(EMPTY_PARAMETERS) == ""
+
+def test_render_no_results():
+    parameters = {**EMPTY_PARAMETERS, "origin": "London", "date": "2025-03-05"}
+    assert render_no_results(parameters) == "Sorry, I couldn't find any flights from London on Wednesday 5 March 2025."
+
+def test_render_no_results_without_criteria():
+    assert render_no_results(EMPTY_PARAMETERS) == "Sorry, I couldn't find any flights."
+
+def test_render_single_flight():
+    response = render_single_flight(make_flight("BA123", 5, 9, 5))
+    assert response == "Flight **BA123** from London to Paris departs on Wednesday 5 March 2025 at 09:05."
+
+def test_render_flights_by_date_groups_and_sorts():
+    flights = [
+        make_flight("BA3", 6, 8),
+        make_flight("BA2", 5, 18),
+        make_flight("BA1", 5, 7),
+    ]
+    response = render_flights_by_date(flights)
+    assert response == "\n".join([
+        "I found 3 flights:",
+        "",
+        "### Wednesday 5 March 2025",
+        "- **BA1** London to Paris at 07:00",
+        "- **BA2** London to Paris at 18:00",
+        "",
+        "### Thursday 6 March 2025",
+        "- **BA3** London to Paris at 08:00",
+    ])
+
+# =====================
+# Policy Tests
+# =====================
+
+@pytest.mark.parametrize("query, language, flight_count, expected, description", [
+    ("Show me flights from London to Paris", "en", 3, True, "Simple listing should use a template"),
+    ("Show me flights from London to Paris", "EN", 0, True, "No results should use a template"),
+    ("Show me flights from London", "en", MAX_TEMPLATED_FLIGHTS + 1, False, "Long lists should go to Gemini"),
+    ("What is the earliest flight to Paris?", "en", 3, False, "Reasoning questions should go to Gemini"),
+    ("How many flights go to Paris?", "en", 3, False, "Counting questions should go to Gemini"),
+    ("Quel est le vol le plus tôt pour Paris ?", "fr", 3, False, "Non English queries should go to Gemini"),
+    ("voli da Londra a Parigi", "it", 3, False, "Non English queries written in ASCII should go to Gemini"),
+    ("Show me flights from London to Paris", None, 3, False, "Unknown language should go to Gemini"),
+])
+def test_should_use_template(query, language, flight_count, expected, description):
+    flights = [make_flight(f"BA{i}", 5, i % 24) for i in range(flight_count)]
+    parameters = {**EMPTY_PARAMETERS, "language": language}
+    assert should_use_template(query, parameters, flights) == expected, description
+
+def test_render_templated_response_falls_back():
+    flights = [make_flight("BA1", 5, 7)]
+    assert render_templated_response("Which is the cheapest?", ENGLISH_PARAMETERS, flights) is None
+
+def test_render_templated_response_picks_shape():
+    query = "Flights from London to Paris"
+    assert render_templated_response(query, ENGLISH_PARAMETERS, []).startswith("Sorry")
+    assert render_templated_response(query, ENGLISH_PARAMETERS, [make_flight("BA1", 5, 7)]).startswith("Flight **BA1**")
+    flights = [make_flight("BA1", 5, 7), make_flight("BA2", 5, 8)]
+    assert render_templated_response(query, ENGLISH_PARAMETERS, flights).startswith("I found 2 flights:")
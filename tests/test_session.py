@@ -0,0 +1,236 @@
+import json
+import pytest
+
+import mock_database
+import session
+from mock_database import flight_data
+from session import FlightSession, merge_parameters, is_narrowing
+from tests.helpers import EMPTY_PARAMETERS, make_flight
+
+@pytest.fixture
+def dummy_gemini(monkeypatch):
+    """
+    A fixture that answers extraction prompts with queued parameter dictionaries
+    and records every prompt sent to Gemini.
+    """
+    state = {"parameters": [], "prompts": []}
+
+    def dummy(prompt: str) -> str:
+        state["prompts"].append(prompt)
+        if "Extract flight information" in prompt:
+            return json.dumps({**EMPTY_PARAMETERS, **state["parameters"].pop(0)})
+        return "Final dummy response using flight data."
+
+    monkeypatch.setattr("query_handler.generate_gemini_response", dummy)
+    return state
+
+# =====================
+# Merge Tests
+# =====================
+
+def test_merge_parameters_keeps_previous_values():
+    previous = {**EMPTY_PARAMETERS, "origin": "London", "date": "2025-03-06"}
+    new = {**EMPTY_PARAMETERS, "before_time": "12:00"}
+    merged = merge_parameters(previous, new)
+    assert merged["origin"] == "London"
+    assert merged["before_time"] == "12:00"
+    # An interval on a different key shouldn't remove the date
+    assert merged["date"] == "2025-03-06"
+
+def test_merge_parameters_exact_date_replaces_interval():
+    previous = {**EMPTY_PARAMETERS, "after_date": "2025-03-04", "before_date": "2025-03-06"}
+    new = {**EMPTY_PARAMETERS, "date": "2025-03-07"}
+    merged = merge_parameters(previous, new)
+    assert merged["date"] == "2025-03-07"
+    assert merged["after_date"] is None
+    assert merged["before_date"] is None
+
+def test_merge_parameters_interval_replaces_exact_time():
+    previous = {**EMPTY_PARAMETERS, "time": "10:00"}
+    new = {**EMPTY_PARAMETERS, "after_time": "12:00"}
+    merged = merge_parameters(previous, new)
+    assert merged["time"] is None
+    assert merged["after_time"] == "12:00"
+
+def test_merge_parameters_new_search_drops_previous_values():
+    previous = {**EMPTY_PARAMETERS, "flight_number": "AA101", "date": "2025-03-05"}
+    new = {**EMPTY_PARAMETERS, "origin": "London", "new_search": True, "clear": []}
+    merged = merge_parameters(previous, new)
+    assert merged == {**EMPTY_PARAMETERS, "origin": "London", "aggregate": None, "language": None}
+
+def test_merge_parameters_clear_removes_keys_and_intervals():
+    previous = {**EMPTY_PARAMETERS, "origin": "London", "date": "2025-03-05", "after_date": "2025-03-04"}
+    new = {**EMPTY_PARAMETERS, "new_search": False, "clear": ["date", "not_a_key"]}
+    merged = merge_parameters(previous, new)
+    assert merged["origin"] == "London"
+    assert merged["date"] is None
+    assert merged["after_date"] is None
+    assert "not_a_key" not in merged
+    assert "clear" not in merged and "new_search" not in merged
+
+# =====================
+# Narrowing Tests
+# =====================
+
+@pytest.mark.parametrize("previous, new, expected, description", [
+    ({"origin": "London"}, {"origin": "london", "before_time": "12:00"}, True, "Adding a constraint narrows"),
+    ({"origin": "London"}, {"origin": "Paris"}, False, "Changing the origin doesn't narrow"),
+    ({"flight_number": "AA101"}, {"flight_number": "AA101"}, True, "The same flight number narrows"),
+    ({"flight_number": "aa101"}, {"flight_number": "AA101"}, False,
+     "Flight numbers are matched exactly so a different case doesn't narrow"),
+    ({"origin": "London"}, {}, False, "Removing a constraint doesn't narrow"),
+    ({"date": "2025-03-06"}, {"date": "2025-03-07"}, False, "Changing the date doesn't narrow"),
+    ({"before_time": "12:00"}, {"before_time": "10:00"}, True, "An earlier upper bound narrows"),
+    ({"before_time": "12:00"}, {"before_time": "14:00"}, False, "A later upper bound doesn't narrow"),
+    ({"after_date": "2025-03-04"}, {"after_date": "2025-03-05"}, True, "A later lower bound narrows"),
+    ({"after_date": "2025-03-04", "before_date": "2025-03-06"}, {"date": "2025-03-05"}, True,
+     "An exact date inside the interval narrows"),
+    ({"after_date": "2025-03-04"}, {"date": "2025-03-03"}, False, "An exact date outside the interval doesn't narrow"),
+])
+def test_is_narrowing(previous, new, expected, description):
+    assert is_narrowing({**EMPTY_PARAMETERS, **previous}, {**EMPTY_PARAMETERS, **new}) == expected, description
+
+# =====================
+# Session Tests
+# =====================
+
+def test_session_filters_previous_results_when_narrowing(dummy_gemini, monkeypatch):
+    dummy_gemini["parameters"] = [
+        {"origin": "London"},
+        {"before_time": "12:00"},
+    ]
+    flight_session = FlightSession()
+    flight_session.process_response("Show me flights from London")
+
+    # A narrowing follow-up must not search the whole database again
+    def fail_search(parameters):
+        raise AssertionError("search_flights should not be called")
+    monkeypatch.setattr(session, "search_flights", fail_search)
+
+    flight_session.process_response("only the morning ones")
+    assert flight_session.parameters["origin"] == "London"
+    assert flight_session.flights
+    assert all(flight["origin"] == "London" and flight["time"].hour < 12 for flight in flight_session.flights)
+
+def test_session_searches_again_when_not_narrowing(dummy_gemini):
+    dummy_gemini["parameters"] = [
+        {"origin": "London", "date": "2025-03-05"},
+        {"date": "2025-03-06"},
+    ]
+    flight_session = FlightSession()
+    flight_session.process_response("Show me flights from London on the 5th")
+    flight_session.process_response("what about the day after")
+
+    flight_numbers = {flight["flight_number"] for flight in flight_session.flights}
+    assert flight_numbers == {"BA2525", "BA8787", "BA9898"}
+
+def test_session_sends_previous_parameters_and_history(dummy_gemini):
+    dummy_gemini["parameters"] = [
+        {"origin": "London"},
+        {"destination": "Dubai"},
+    ]
+    flight_session = FlightSession()
+    flight_session.process_response("Show me flights from London")
+    flight_session.process_response("just the ones to Dubai")
+
+    follow_up_prompt = [prompt for prompt in dummy_gemini["prompts"] if "Extract flight information" in prompt][-1]
+    assert '"origin": "London"' in follow_up_prompt
+    assert "User: Show me flights from London" in follow_up_prompt
+
+def test_session_history_is_bounded(dummy_gemini):
+    dummy_gemini["parameters"] = [{"origin": "London"} for _ in range(4)]
+    flight_session = FlightSession(max_history_turns=2)
+    for turn in range(4):
+        flight_session.process_response(f"Show me flights from London {turn}")
+
+    assert [query for query, _ in flight_session.history] == [
+        "Show me flights from London 2",
+        "Show me flights from London 3",
+    ]
+
+def test_session_answers_aggregates_without_keeping_flights(dummy_gemini):
+    dummy_gemini["parameters"] = [
+        {"origin": "London", "aggregate": "count"},
+        {"date": "2025-03-06"},
+    ]
+    flight_session = FlightSession()
+    flight_session.process_response("How many flights leave London?")
+    assert flight_session.flights is None
+    assert '"number_of_flights": ' in dummy_gemini["prompts"][-1]
+
+    # The aggregate question isn't carried over to the follow-up
+    flight_session.process_response("show me the ones on the 6th")
+    assert flight_session.parameters["aggregate"] is None
+    assert all(flight["origin"] == "London" for flight in flight_session.flights)
+
+def test_session_new_flight_search_replaces_flight_number(dummy_gemini):
+    dummy_gemini["parameters"] = [
+        {"flight_number": "AA101"},
+        {"origin": "London", "destination": "Dubai", "new_search": True, "clear": []},
+    ]
+    flight_session = FlightSession()
+    flight_session.process_response("Where does AA101 go?")
+    flight_session.process_response("Show me flights from London to Dubai")
+
+    assert flight_session.parameters["flight_number"] is None
+    assert [flight["flight_number"] for flight in flight_session.flights] == ["BA1414"]
+
+def test_session_clears_date_for_any_day(dummy_gemini):
+    dummy_gemini["parameters"] = [
+        {"destination": "London", "date": "2025-03-06"},
+        {"new_search": False, "clear": ["date"]},
+    ]
+    flight_session = FlightSession()
+    flight_session.process_response("Flights to London on the 6th")
+    flight_session.process_response("what about any day")
+
+    assert flight_session.parameters["date"] is None
+    assert flight_session.parameters["destination"] == "London"
+    dates = {flight["date"] for flight in flight_session.flights}
+    assert len(dates) > 1
+
+def test_session_unrelated_question_starts_new_search(dummy_gemini):
+    dummy_gemini["parameters"] = [
+        {"origin": "London", "date": "2025-03-06", "before_time": "12:00"},
+        {"destination": "Paris", "new_search": True, "clear": []},
+    ]
+    flight_session = FlightSession()
+    flight_session.process_response("Morning flights from London on the 6th")
+    flight_session.process_response("Which flights go to Paris?")
+
+    assert flight_session.parameters == {
+        **EMPTY_PARAMETERS, "destination": "Paris", "aggregate": None, "language": None
+    }
+    assert all(flight["destination"] == "Paris" for flight in flight_session.flights)
+    assert len(flight_session.flights) == len([f for f in flight_data if f["destination"] == "Paris"])
+
+def test_follow_up_prompt_does_not_assume_today(dummy_gemini):
+    dummy_gemini["parameters"] = [{"origin": "London"}, {"destination": "Dubai"}]
+    flight_session = FlightSession()
+    flight_session.process_response("Show me flights from London")
+    flight_session.process_response("just the ones to Dubai")
+
+    first_prompt, follow_up_prompt = [
+        prompt for prompt in dummy_gemini["prompts"] if "Extract flight information" in prompt
+    ]
+    today_default = "does not mention a specific date, assume they are referring to today"
+    assert today_default in first_prompt
+    assert today_default not in follow_up_prompt
+    assert "new_search" in follow_up_prompt and "new_search" not in first_prompt
+
+def test_session_searches_again_after_database_changes(dummy_gemini):
+    dummy_gemini["parameters"] = [
+        {"origin": "London"},
+        {"before_time": "12:00"},
+    ]
+    flight_session = FlightSession()
+    flight_session.process_response("Show me flights from London")
+
+    flight = make_flight("ZZ1", 6, 8)
+    mock_database.add_flight(flight)
+    try:
+        flight_session.process_response("only the morning ones")
+    finally:
+        mock_database.remove_flight(flight)
+
+    assert "ZZ1" in [found["flight_number"] for found in flight_session.flights]